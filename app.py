@@ -1,11 +1,21 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import yfinance as yf
+from curl_cffi import requests as curl_requests
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
+import bottleneck as bn
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
+import re
+import tempfile
+import threading
+
+from indicators import bollinger, ichimoku_hl, momentum, new_momentum_state
 
 # ==========================================
 # 1. ページ基本設定
@@ -20,26 +30,37 @@ st.set_page_config(
 # 2. データ取得・加工ロジック (関数群)
 # ==========================================
 
+@st.cache_resource
+def get_session():
+    """
+    Yahoo への通信で使い回すセッション (yfinance の既定と同じくブラウザを偽装する)。
+    再実行をまたいで接続を保持し、TLS ハンドシェイクを銘柄ごとにやり直さないようにする
+    """
+    return curl_requests.Session(impersonate="chrome")
+
 @st.cache_data(ttl=3600)  # 1時間キャッシュを保持
 def get_stock_info(symbol):
     """銘柄の基本情報を取得"""
     try:
-        ticker_obj = yf.Ticker(symbol)
-        info = ticker_obj.info
-        return {
-            "name": info.get('shortName', symbol),
-            "currency": info.get('currency', 'JPY'),
-        }
-    except:
+        # 重い .info (quoteSummary) ではなく、fast_info と同じ
+        # チャート API のメタデータから銘柄名と通貨を読む
+        meta = yf.Ticker(symbol, session=get_session()).get_history_metadata()
+    except Exception:
         return {"name": symbol, "currency": "???"}
+    return {
+        "name": meta.get('shortName', symbol),
+        "currency": meta.get('currency', 'JPY'),
+    }
 
-@st.cache_data
-def load_and_process_data(symbol, period_str):
-    """
-    指定期間より多めにデータを取得して移動平均を計算し、
-    表示期間分だけを切り出す
-    """
-    # 期間計算
+# 日本株の証券コード (数字4桁) の判定
+_JP_TICKER = re.compile(r'\d{4}').fullmatch
+
+def to_ticker(code):
+    """日本株（数字4桁）なら自動で .T を付与"""
+    return f"{code}.T" if _JP_TICKER(code) else code
+
+def get_fetch_range(period_str):
+    """表示開始日・取得開始日・終了日を返す"""
     end_date = datetime.today()
     period_map = {"1mo": 30, "3mo": 90, "6mo": 180, "1y": 365, "2y": 730, "5y": 1825}
     days = period_map.get(period_str, 365)
@@ -47,60 +68,300 @@ def load_and_process_data(symbol, period_str):
     
     # 計算用に200日前から取得 (MA75や一目均衡表を確保するため)
     fetch_start = display_start - timedelta(days=200)
-    
-    # データ取得
-    df = yf.download(symbol, start=fetch_start, end=end_date, interval="1d", multi_level_index=False)
-    
-    if df.empty:
-        return pd.DataFrame()
+    return display_start, fetch_start, end_date
 
-    # 移動平均線の計算
-    df['MA5'] = df['Close'].rolling(window=5).mean()
-    df['MA25'] = df['Close'].rolling(window=25).mean()
-    df['MA75'] = df['Close'].rolling(window=75).mean()
-    df['Volume_MA20'] = df['Volume'].rolling(window=20).mean()
-    
-    # Bollinger Bands (20, 2sigma)
-    df['BB_MA20'] = df['Close'].rolling(window=20).mean()
-    df['BB_Std'] = df['Close'].rolling(window=20).std()
-    df['BB_Upper'] = df['BB_MA20'] + (2 * df['BB_Std'])
-    df['BB_Lower'] = df['BB_MA20'] - (2 * df['BB_Std'])
+# 株価データのディスクキャッシュ設定 (Streamlit 再起動後も再利用する)
+CACHE_DIR = ".yf_cache"
+CACHE_TTL = timedelta(hours=6)
 
-    # Ichimoku Cloud
+# キャッシュのファイル名に使ってよい銘柄コード (Yahoo のシンボルで使われる文字のみ)
+_CACHE_SYMBOL = re.compile(r'[A-Za-z0-9.^=-]+').fullmatch
+
+def _cache_path(symbol, period_str):
+    """
+    銘柄・表示期間ごとのキャッシュファイルのパス (1組につき1ファイルを上書きする)。
+    パスに使えない文字を含む銘柄コードはキャッシュしない (None を返す)
+    """
+    if not _CACHE_SYMBOL(symbol):
+        return None
+    return os.path.join(CACHE_DIR, f"{symbol}_{period_str}.pkl")
+
+def _is_cache_fresh(cache_path):
+    if cache_path is None or not os.path.exists(cache_path):
+        return False
+    age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(cache_path))
+    return age < CACHE_TTL
+
+def _load_cache(cache_path):
+    """有効期限内のキャッシュを読む (読めない場合は None を返してキャッシュミス扱いにする)"""
+    if not _is_cache_fresh(cache_path):
+        return None
+    try:
+        return pd.read_pickle(cache_path)
+    except Exception:
+        return None
+
+def _save_cache(df, cache_path):
+    """一時ファイルに書いてから置き換え、書きかけのファイルを他のセッションが読まないようにする"""
+    if cache_path is None:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            df.to_pickle(f)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def download_history(symbol, period_str, refresh=False):
+    """
+    日足データを取得 (ディスクキャッシュが有効期限内ならそれを返す)
+    refresh=True のときはキャッシュを使わずに取得し直して上書きする
+    """
+    cache_path = _cache_path(symbol, period_str)
+    df = None if refresh else _load_cache(cache_path)
+    if df is not None:
+        return df
+
+    _, fetch_start, end_date = get_fetch_range(period_str)
+    df = yf.download(
+        symbol, start=fetch_start, end=end_date, interval="1d", multi_level_index=False,
+        session=get_session()
+    )
+    if not df.empty:
+        _save_cache(df, cache_path)
+    return df
+
+# Yahoo の一括取得は1リクエスト20銘柄まで
+PREFETCH_BATCH_SIZE = 20
+
+@st.cache_data(ttl=3600)
+def prefetch_history(symbols, period_str):
+    """
+    複数銘柄の日足をまとめて取得し、ディスクキャッシュに書き込む
+    (お気に入りの切り替え時に1銘柄ずつ通信しないようにする)
+    """
+    _, fetch_start, end_date = get_fetch_range(period_str)
+    # キャッシュできない銘柄コードは先読みしても使われないので除く
+    cache_paths = [(s, _cache_path(s, period_str)) for s in symbols]
+    missing = [s for s, path in cache_paths if path is not None and not _is_cache_fresh(path)]
+
+    for i in range(0, len(missing), PREFETCH_BATCH_SIZE):
+        batch = missing[i:i + PREFETCH_BATCH_SIZE]
+        data = yf.download(
+            " ".join(batch), start=fetch_start, end=end_date, interval="1d",
+            group_by='ticker', threads=True, session=get_session()
+        )
+        if data.empty:
+            continue
+        for symbol in batch:
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            df = data[symbol].dropna(how='all')
+            if not df.empty:
+                _save_cache(df, _cache_path(symbol, period_str))
+
+# 株価データ・指標のキャッシュ保持時間
+# (期限切れ後は前回の最終日以降の足だけを取得して増分更新する)
+REFRESH_TTL = timedelta(minutes=15)
+
+# 増分更新時に移動平均線を計算し直すために使う直近の行数 (最長の窓 MA75 分)
+INCREMENTAL_LOOKBACK = 75
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# 増分更新時に、前回と今回で重なった確定足の終値を同じとみなす許容誤差 (相対)
+OVERLAP_RTOL = 1e-6
+
+def _add_moving_averages(df):
+    """移動平均線の計算 (bottleneck の move_* で numpy 配列に直接適用)"""
+    close = df['Close'].to_numpy(dtype='float64')
+    volume = df['Volume'].to_numpy(dtype='float64')
+    df['MA5'] = bn.move_mean(close, 5, min_count=5)
+    df['MA25'] = bn.move_mean(close, 25, min_count=25)
+    df['MA75'] = bn.move_mean(close, 75, min_count=75)
+    df['Volume_MA20'] = bn.move_mean(volume, 20, min_count=20)
+
+def _add_momentum(df, momentum_state):
+    """
+    RSI (14) / MACD (12, 26, 9) の計算。momentum_state を最終行まで進め、
+    最終行の直前 (確定済みの足) までの状態を返す
+    """
+    close = df['Close'].to_numpy(dtype='float64')
+    # 最終行は取引時間中だと値が変わるので、その手前の状態を次回の増分更新用に残す
+    confirmed = momentum(close[:-1], momentum_state)
+    confirmed_state = momentum_state.copy()
+    latest = momentum(close[-1:], momentum_state)
+    df['RSI'], df['MACD'], df['Signal'], df['MACD_Hist'] = (
+        np.concatenate(pair) for pair in zip(confirmed, latest)
+    )
+    return confirmed_state
+
+# 増分更新用の状態を保持する (銘柄, 期間) の数と保持期間 (メモリ使用量を抑える)
+INDICATOR_STATE_MAX_ENTRIES = 32
+INDICATOR_STATE_TTL = timedelta(days=1)
+
+@st.cache_resource(max_entries=INDICATOR_STATE_MAX_ENTRIES, ttl=INDICATOR_STATE_TTL)
+def _indicator_state(symbol, period_str):
+    """
+    増分更新用に、計算済みの日足データと RSI / MACD の内部状態を再実行をまたいで保持する
+    (破棄された場合は次回の取得で全期間から計算し直す)
+    """
+    return {'df': None, 'momentum': None, 'lock': threading.Lock()}
+
+@st.cache_data(ttl=REFRESH_TTL)
+def _compute_base(symbol, period_str):
+    """計算用の期間を含めた日足データを取得し、移動平均線と RSI / MACD を計算"""
+    _, fetch_start, end_date = get_fetch_range(period_str)
+    state = _indicator_state(symbol, period_str)
+
+    with state['lock']:
+        prev = state['df']
+        refresh = False
+        if prev is not None:
+            # 2回目以降は前回の最後の確定足から取得し直し、重なった足の終値が一致するか確かめる
+            # (株式分割や配当で過去の株価が修正されていたら、つなぎ合わせずに全期間から計算し直す)
+            last_confirmed = prev.index[-2] if len(prev) >= 2 else None
+            new = pd.DataFrame()
+            if last_confirmed is not None:
+                new = yf.download(
+                    symbol, start=last_confirmed, end=end_date, interval="1d",
+                    multi_level_index=False, session=get_session()
+                )
+            if last_confirmed is not None and new.empty:
+                # 取得できなかったときは前回の結果をそのまま使う
+                return prev.loc[pd.Timestamp(fetch_start):]
+            if last_confirmed not in new.index or not np.isclose(
+                new.at[last_confirmed, 'Close'], prev.at[last_confirmed, 'Close'], rtol=OVERLAP_RTOL
+            ):
+                state['df'] = prev = None
+                refresh = True
+
+        if prev is None:
+            # 初回 (または過去の株価が修正されたとき) は計算用の期間全体を取得して計算
+            df = download_history(symbol, period_str, refresh=refresh)
+            if df.empty:
+                return pd.DataFrame()
+            # 以降の日付による切り出しは index が昇順であることを前提にする
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index()
+            _add_moving_averages(df)
+            momentum_state = new_momentum_state()
+            state['momentum'] = _add_momentum(df, momentum_state)
+        else:
+            # 前回の最終日 (未確定の可能性あり) 以降の足だけを、移動平均線は直近の窓分だけ、
+            # RSI / MACD は保存した状態から続けて計算する
+            new = new[new.index >= prev.index[-1]]
+            if new.empty:
+                return prev.loc[pd.Timestamp(fetch_start):]
+
+            confirmed = prev.iloc[:-1]
+            recent = pd.concat([confirmed[OHLCV_COLUMNS].tail(INCREMENTAL_LOOKBACK), new[OHLCV_COLUMNS]])
+            _add_moving_averages(recent)
+            appended = recent.iloc[-len(new):].copy()
+            momentum_state = state['momentum'].copy()
+            state['momentum'] = _add_momentum(appended, momentum_state)
+            df = pd.concat([confirmed, appended])
+
+        # 計算用の期間より古い行は捨てる (RSI / MACD は保存した状態で引き継がれる)
+        df = df.loc[pd.Timestamp(fetch_start):]
+        state['df'] = df
+    return df
+
+def _compute_bb(base):
+    """Bollinger Bands (20, 2sigma)"""
+    bb = pd.DataFrame(index=base.index)
+    # 中心線・標準偏差・上下バンドを1回のカーネル呼び出しでまとめて計算
+    bb['BB_MA20'], bb['BB_Std'], bb['BB_Upper'], bb['BB_Lower'] = bollinger(
+        base['Close'].to_numpy(dtype='float64'), 20, 2.0
+    )
+    return bb
+
+def _compute_ichimoku(base):
+    """Ichimoku Cloud (先行スパン A/B)"""
+    n = len(base)
+    # 9/26/52 期間の高値・安値を1回のカーネル呼び出しでまとめて計算
+    high9, low9, high26, low26, high52, low52 = ichimoku_hl(
+        base['High'].to_numpy(dtype='float64'), base['Low'].to_numpy(dtype='float64')
+    )
     # Tenkan-sen (Conversion Line): (9-period high + 9-period low) / 2
-    high9 = df['High'].rolling(window=9).max()
-    low9 = df['Low'].rolling(window=9).min()
-    tenkan = (high9 + low9) / 2
+    tenkan = (high9 + low9) * 0.5
     # Kijun-sen (Base Line): (26-period high + 26-period low) / 2
-    high26 = df['High'].rolling(window=26).max()
-    low26 = df['Low'].rolling(window=26).min()
-    kijun = (high26 + low26) / 2
+    kijun = (high26 + low26) * 0.5
     # Senkou Span A (Leading Span A): (Conversion Line + Base Line) / 2, shifted 26
-    df['SpanA'] = ((tenkan + kijun) / 2).shift(26)
+    span_a = np.full(n, np.nan)
+    span_a[26:] = ((tenkan + kijun) * 0.5)[:n - 26]
     # Senkou Span B (Leading Span B): (52-period high + 52-period low) / 2, shifted 26
-    high52 = df['High'].rolling(window=52).max()
-    low52 = df['Low'].rolling(window=52).min()
-    df['SpanB'] = ((high52 + low52) / 2).shift(26)
-
-    # RSI (14) calculation
-    delta = df['Close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.ewm(alpha=1/14, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1/14, adjust=False).mean()
-    rs = avg_gain / avg_loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-
-    # MACD (12, 26, 9) calculation
-    exp12 = df['Close'].ewm(span=12, adjust=False).mean()
-    exp26 = df['Close'].ewm(span=26, adjust=False).mean()
-    df['MACD'] = exp12 - exp26
-    df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-    df['MACD_Hist'] = df['MACD'] - df['Signal']
-
-    # 表示期間に絞り込み
-    df_display = df[df.index >= pd.to_datetime(display_start)].copy()
-    return df_display
+    span_b = np.full(n, np.nan)
+    span_b[26:] = ((high52 + low52) * 0.5)[:n - 26]
+    return pd.DataFrame({'SpanA': span_a, 'SpanB': span_b}, index=base.index)
+
+@st.cache_data(ttl=REFRESH_TTL)
+def load_and_process_data(symbol, period_str, show_bb=False, show_ichimoku=False):
+    """
+    指定期間より多めにデータを取得して移動平均を計算し、
+    表示期間分だけを切り出す
+    (ボリンジャーバンド・一目均衡表は表示する場合のみ計算する)
+    """
+    df = _compute_base(symbol, period_str)
+    if df.empty:
+        return df
+
+    # RSI / MACD は常に表示するので _compute_base で計算済み
+    # ボリンジャーバンド・一目均衡表は、増分更新後の行とずれないよう同じ df から計算する
+    parts = [df]
+    if show_bb:
+        parts.append(_compute_bb(df))
+    if show_ichimoku:
+        parts.append(_compute_ichimoku(df))
+    df = pd.concat(parts, axis=1)
+
+    # 表示期間に絞り込み (日付順に並んだ index を二分探索で切り出し、コピーはしない)
+    display_start, _, _ = get_fetch_range(period_str)
+    return df.loc[pd.Timestamp(display_start):]
+
+@st.cache_resource
+def base_figure():
+    """
+    4段構成のグラフの雛形 (トレース以外のレイアウト) を作成する。
+    make_subplots やレイアウトの検証を再実行のたびに行わないよう1度だけ作り、
+    呼び出し側は go.Figure() で複製してからトレースを追加する
+    """
+    fig = make_subplots(
+        rows=4, cols=1, 
+        shared_xaxes=True, 
+        vertical_spacing=0.04,
+        row_heights=[0.5, 0.15, 0.15, 0.2]
+    )
+
+    # RSI 70/30 lines (トレース追加前なので空のサブプロットにも線を引かせる)
+    fig.add_hline(y=70, line_dash="dash", line_color="orange", line_width=1.0, row=3, col=1,
+                  exclude_empty_subplots=False)
+    fig.add_hline(y=30, line_dash="dash", line_color="cornflowerblue", line_width=1.0, row=3, col=1,
+                  exclude_empty_subplots=False)
+
+    # --- レイアウト調整 ---
+    fig.update_layout(
+        xaxis_rangeslider_visible=False,
+        template="plotly_dark",
+        height=1000,
+        margin=dict(l=50, r=50, b=50, t=50),
+        hovermode="x unified",
+        legend=dict(orientation="h", x=1, y=1.01, xanchor='right', yanchor='bottom'),
+        legend2=dict(orientation="h", x=1, y=0.52, xanchor='right', yanchor='bottom'),
+        legend3=dict(orientation="h", x=1, y=0.35, xanchor='right', yanchor='bottom'),
+        legend4=dict(orientation="h", x=1, y=0.18, xanchor='right', yanchor='bottom'),
+        font=dict(family="Arial, sans-serif", size=10)
+    )
+    
+    # x 軸は数値 (epoch ミリ秒) を日付として解釈させる
+    fig.update_xaxes(type='date')
+    fig.update_yaxes(title_text="Volume", row=2, col=1)
+    fig.update_yaxes(title_text="RSI", range=[0, 100], row=3, col=1)
+    fig.update_yaxes(title_text="MACD", row=4, col=1)
+    return fig
 
 # ==========================================
 # 3. サイドバー (UI設定)
@@ -119,10 +380,17 @@ def load_favorites():
 def save_favorites(favorites):
     with open(FAVORITES_FILE, "w") as f:
         json.dump(favorites, f)
+    # 次回の読み込みでファイルの内容を反映させる
+    _favorites_store.clear()
 
-# お気に入り機能の初期化
+@st.cache_resource
+def _favorites_store():
+    """お気に入りファイルの内容をセッション間で共有する (保存時にクリア)"""
+    return load_favorites()
+
+# お気に入り機能の初期化 (各セッションには共有リストのコピーを持たせる)
 if 'favorites' not in st.session_state:
-    st.session_state['favorites'] = load_favorites()
+    st.session_state['favorites'] = list(_favorites_store())
 
 # 証券コード入力
 if 'ticker_input' not in st.session_state:
@@ -149,11 +417,7 @@ with tab2:
     else:
         st.info("No favorites saved.")
 
-# 日本株（数字4桁）なら自動で .T を付与
-if ticker_input.isdigit() and len(ticker_input) == 4:
-    ticker = f"{ticker_input}.T"
-else:
-    ticker = ticker_input
+ticker = to_ticker(ticker_input)
 
 # 表示期間の選択
 period_choice = st.sidebar.selectbox(
@@ -177,9 +441,17 @@ show_ichimoku = st.sidebar.checkbox("Ichimoku Cloud", value=False)
 # ==========================================
 
 # データと情報の取得
-with st.spinner('Fetching data...'):
-    info = get_stock_info(ticker)
-    df = load_and_process_data(ticker, period_choice)
+# 銘柄情報と株価データは独立した通信なので、銘柄情報は別スレッドで並行して取得する
+# (st.cache_data が使えるようにスクリプト実行コンテキストをワーカーに引き継ぐ)
+with st.spinner('Fetching data...'), ThreadPoolExecutor(
+    max_workers=1, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())
+) as executor:
+    future_info = executor.submit(get_stock_info, ticker)
+    # お気に入り銘柄はまとめて先読みしておく
+    if st.session_state['favorites']:
+        prefetch_history(tuple(to_ticker(c) for c in st.session_state['favorites']), period_choice)
+    df = load_and_process_data(ticker, period_choice, show_bb, show_ichimoku)
+    info = future_info.result()
 
 if df.empty:
     st.error(f"Error: Could not retrieve data for '{ticker}'. Please check the code.")
@@ -187,18 +459,24 @@ else:
     # タイトル表示
     st.title(f"{info['name']} ({ticker})")
     
-    # 4段構成のグラフを作成
-    fig = make_subplots(
-        rows=4, cols=1, 
-        shared_xaxes=True, 
-        vertical_spacing=0.04,
-        row_heights=[0.5, 0.15, 0.15, 0.2]
-    )
+    # 4段構成のグラフを雛形から作成
+    fig = go.Figure(base_figure())
+    fig.update_yaxes(title_text=f"Price ({info['currency']})", row=1, col=1)
+
+    # 日付は文字列ではなく epoch ミリ秒の数値配列で渡す
+    # (plotly.js は int64 の型付き配列に対応していないため、誤差なく表せる float64 にする)
+    x_epoch = df.index.values.astype('datetime64[ms]').astype('int64').astype('float64')
+
+    # トレースには Series ではなく numpy 配列を渡す
+    # (Plotly が base64 の型付き配列としてバイナリのまま送れるようにする)。
+    # 価格・指標はグラフ用にだけ float32 にして転送量を半分にする (表の値は float64 のまま)
+    def arr(col):
+        return df[col].to_numpy(dtype='float32')
 
     # --- 上段: ローソク足 & 移動平均線 ---
     # ローソク足
     fig.add_trace(go.Candlestick(
-        x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'],
+        x=x_epoch, open=arr('Open'), high=arr('High'), low=arr('Low'), close=arr('Close'),
         name='Price'
     ), row=1, col=1)
 
@@ -207,18 +485,18 @@ else:
     for ma_name, show_flag, color in ma_specs:
         if show_flag:
             fig.add_trace(go.Scatter(
-                x=df.index, y=df[ma_name], name=ma_name,
+                x=x_epoch, y=arr(ma_name), name=ma_name,
                 line=dict(color=color, width=line_width)
             ), row=1, col=1)
 
     # ボリンジャーバンド
     if show_bb:
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['BB_Upper'], name='BB Upper',
+            x=x_epoch, y=arr('BB_Upper'), name='BB Upper',
             line=dict(color='rgba(190, 160, 255, 0.5)', width=1),
         ), row=1, col=1)
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['BB_Lower'], name='BB Lower',
+            x=x_epoch, y=arr('BB_Lower'), name='BB Lower',
             line=dict(color='rgba(190, 160, 255, 0.5)', width=1),
             fill='tonexty', fillcolor='rgba(190, 160, 255, 0.1)',
         ), row=1, col=1)
@@ -226,45 +504,42 @@ else:
     # 一目均衡表 (雲)
     if show_ichimoku:
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['SpanA'], name='Span A',
+            x=x_epoch, y=arr('SpanA'), name='Span A',
             line=dict(color='rgba(46, 204, 113, 0.5)', width=1, dash='dot'),
         ), row=1, col=1)
         fig.add_trace(go.Scatter(
-            x=df.index, y=df['SpanB'], name='Span B',
+            x=x_epoch, y=arr('SpanB'), name='Span B',
             line=dict(color='rgba(231, 76, 60, 0.5)', width=1, dash='dot'),
             fill='tonexty', fillcolor='rgba(128, 128, 128, 0.2)',
         ), row=1, col=1)
 
     # --- 下段: 出来高 (棒グラフ) ---
     fig.add_trace(go.Bar(
-        x=df.index, y=df['Volume'], name='Volume',
+        x=x_epoch, y=df['Volume'].to_numpy(), name='Volume',
         marker_color='#1f77b4', opacity=0.8, marker_line_width=0,
         legend="legend2"
     ), row=2, col=1)
 
     # 出来高移動平均線 (20日)
     fig.add_trace(go.Scatter(
-        x=df.index, y=df['Volume_MA20'], name='Volume MA20',
+        x=x_epoch, y=arr('Volume_MA20'), name='Volume MA20',
         line=dict(color='#ff9900', width=1.5),
         legend="legend2"
     ), row=2, col=1)
 
     # --- 最下段: RSI ---
     fig.add_trace(go.Scatter(
-        x=df.index, y=df['RSI'], name='RSI (14)',
+        x=x_epoch, y=arr('RSI'), name='RSI (14)',
         line=dict(color='#d62728', width=1.5),
         legend="legend3"
     ), row=3, col=1)
 
-    # RSI 70/30 lines
-    fig.add_hline(y=70, line_dash="dash", line_color="orange", line_width=1.0, row=3, col=1)
-    fig.add_hline(y=30, line_dash="dash", line_color="cornflowerblue", line_width=1.0, row=3, col=1)
-
     # --- 最下段: MACD ---
     # Histogram
-    colors = ['#2ca02c' if v >= 0 else '#d62728' for v in df['MACD_Hist']]
+    macd_hist = arr('MACD_Hist')
+    colors = np.where(macd_hist >= 0, '#2ca02c', '#d62728')
     fig.add_trace(go.Bar(
-        x=df.index, y=df['MACD_Hist'], name='MACD Hist',
+        x=x_epoch, y=macd_hist, name='MACD Hist',
         marker_color=colors,
         marker_line_width=0,
         legend="legend4"
@@ -272,37 +547,18 @@ else:
     
     # MACD Line
     fig.add_trace(go.Scatter(
-        x=df.index, y=df['MACD'], name='MACD',
+        x=x_epoch, y=arr('MACD'), name='MACD',
         line=dict(color='#1f77b4', width=1.5),
         legend="legend4"
     ), row=4, col=1)
     
     # Signal Line
     fig.add_trace(go.Scatter(
-        x=df.index, y=df['Signal'], name='Signal',
+        x=x_epoch, y=arr('Signal'), name='Signal',
         line=dict(color='#ff7f0e', width=1.5),
         legend="legend4"
     ), row=4, col=1)
 
-    # --- レイアウト調整 ---
-    fig.update_layout(
-        xaxis_rangeslider_visible=False,
-        template="plotly_dark",
-        height=1000,
-        margin=dict(l=50, r=50, b=50, t=50),
-        hovermode="x unified",
-        legend=dict(orientation="h", x=1, y=1.01, xanchor='right', yanchor='bottom'),
-        legend2=dict(orientation="h", x=1, y=0.52, xanchor='right', yanchor='bottom'),
-        legend3=dict(orientation="h", x=1, y=0.35, xanchor='right', yanchor='bottom'),
-        legend4=dict(orientation="h", x=1, y=0.18, xanchor='right', yanchor='bottom'),
-        font=dict(family="Arial, sans-serif", size=10)
-    )
-    
-    fig.update_yaxes(title_text=f"Price ({info['currency']})", row=1, col=1)
-    fig.update_yaxes(title_text="Volume", row=2, col=1)
-    fig.update_yaxes(title_text="RSI", range=[0, 100], row=3, col=1)
-    fig.update_yaxes(title_text="MACD", row=4, col=1)
-
     # グラフ表示
     st.plotly_chart(fig, use_container_width=True)
 
@@ -0,0 +1,211 @@
+import os
+
+# コンパイル済みカーネルの保存先 (numba の import 前に設定する必要がある)。
+# 作業ディレクトリに置いて、再起動後も JIT コンパイルをやり直さずに済むようにする
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.abspath(".numba_cache"))
+
+import numpy as np
+from numba import njit
+
+# ==========================================
+# テクニカル指標の計算カーネル (Numba)
+# ==========================================
+
+@njit(cache=True)
+def _rolling_max_min(high, low, window, out_max, out_min):
+    """
+    単調デックで High の移動最大値と Low の移動最小値を1パスで計算する。
+    pandas の rolling(window).max()/min() と同様、窓内に NaN があれば NaN を返す
+    """
+    n = high.shape[0]
+    # 窓内のインデックスを保持するリングバッファ (先頭 head から size 個)
+    q_max = np.empty(window, dtype=np.int64)
+    q_min = np.empty(window, dtype=np.int64)
+    head_max = size_max = 0
+    head_min = size_min = 0
+    # 直近の NaN の位置
+    nan_max = -window
+    nan_min = -window
+
+    for i in range(n):
+        # 窓から外れたインデックスを先頭から捨てる
+        if size_max > 0 and q_max[head_max] <= i - window:
+            head_max = (head_max + 1) % window
+            size_max -= 1
+        if size_min > 0 and q_min[head_min] <= i - window:
+            head_min = (head_min + 1) % window
+            size_min -= 1
+
+        h = high[i]
+        if np.isnan(h):
+            nan_max = i
+        else:
+            # 自分以下の値は二度と最大値にならないので末尾から捨てる (降順デック)
+            while size_max > 0 and high[q_max[(head_max + size_max - 1) % window]] <= h:
+                size_max -= 1
+            q_max[(head_max + size_max) % window] = i
+            size_max += 1
+
+        lo = low[i]
+        if np.isnan(lo):
+            nan_min = i
+        else:
+            # 自分以上の値は二度と最小値にならないので末尾から捨てる (昇順デック)
+            while size_min > 0 and low[q_min[(head_min + size_min - 1) % window]] >= lo:
+                size_min -= 1
+            q_min[(head_min + size_min) % window] = i
+            size_min += 1
+
+        if i >= window - 1 and i - nan_max >= window:
+            out_max[i] = high[q_max[head_max]]
+        else:
+            out_max[i] = np.nan
+        if i >= window - 1 and i - nan_min >= window:
+            out_min[i] = low[q_min[head_min]]
+        else:
+            out_min[i] = np.nan
+
+
+@njit(cache=True)
+def ichimoku_hl(high, low):
+    """一目均衡表用の 9/26/52 期間の高値・安値を計算"""
+    n = high.shape[0]
+    h9, l9 = np.empty(n), np.empty(n)
+    h26, l26 = np.empty(n), np.empty(n)
+    h52, l52 = np.empty(n), np.empty(n)
+    _rolling_max_min(high, low, 9, h9, l9)
+    _rolling_max_min(high, low, 26, h26, l26)
+    _rolling_max_min(high, low, 52, h52, l52)
+    return h9, l9, h26, l26, h52, l52
+
+
+def new_momentum_state():
+    """
+    momentum() の内部状態の初期値
+    (前日終値, 平均上昇幅, 平均下落幅, EMA12, EMA26, シグナル, EMA12 の重み, EMA26 の重み
+    の順。NaN は未計算)
+    """
+    state = np.full(8, np.nan)
+    state[6] = state[7] = 1.0
+    return state
+
+
+@njit(cache=True)
+def momentum(close, state):
+    """
+    RSI(14) と MACD(12, 26, 9) を1回のループで計算する。
+    いずれも pandas の ewm(adjust=False) と同じ漸化式で更新する
+    (終値が NaN の日の扱いも ignore_na=False と同じ)。
+    state は直前の行までの内部状態で、最終行まで進めた状態に書き換えられる
+    (続きの行を渡せば先頭から計算し直さずに増分更新できる)
+    """
+    n = close.shape[0]
+    rsi = np.empty(n)
+    macd = np.empty(n)
+    signal = np.empty(n)
+    hist = np.empty(n)
+
+    a_rsi = 1.0 / 14.0
+    a12 = 2.0 / 13.0
+    a26 = 2.0 / 27.0
+    a9 = 2.0 / 10.0
+
+    prev, avg_gain, avg_loss, ema12, ema26, ema9 = (
+        state[0], state[1], state[2], state[3], state[4], state[5]
+    )
+    w12, w26 = state[6], state[7]
+    for i in range(n):
+        c = close[i]
+
+        # RSI: 前日比が NaN の場合は上昇・下落とも 0 として扱う
+        delta = c - prev
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if np.isnan(avg_gain):
+            avg_gain, avg_loss = gain, loss
+        else:
+            avg_gain += a_rsi * (gain - avg_gain)
+            avg_loss += a_rsi * (loss - avg_loss)
+        if avg_loss == 0.0:
+            rsi[i] = 100.0 if avg_gain > 0.0 else np.nan
+        else:
+            rsi[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        prev = c
+
+        # MACD: 終値が NaN の日は EMA12/26 は直前の値を保持し、その分だけ直前の値の重みを減衰させる
+        # (次の終値で (w * ema + a * c) / (w + a) として反映される)
+        if np.isnan(c):
+            if not np.isnan(ema12):
+                w12 *= 1.0 - a12
+                w26 *= 1.0 - a26
+        elif np.isnan(ema12):
+            ema12 = ema26 = c
+        else:
+            w12 *= 1.0 - a12
+            w26 *= 1.0 - a26
+            ema12 = (w12 * ema12 + a12 * c) / (w12 + a12)
+            ema26 = (w26 * ema26 + a26 * c) / (w26 + a26)
+            w12 = w26 = 1.0
+        # シグナルは (NaN の日も保持された) MACD の EMA なので毎日更新する
+        m = ema12 - ema26
+        if not np.isnan(m):
+            if np.isnan(ema9):
+                ema9 = m
+            else:
+                ema9 += a9 * (m - ema9)
+        macd[i] = m
+        signal[i] = ema9
+        hist[i] = macd[i] - ema9
+
+    state[0], state[1], state[2] = prev, avg_gain, avg_loss
+    state[3], state[4], state[5] = ema12, ema26, ema9
+    state[6], state[7] = w12, w26
+    return rsi, macd, signal, hist
+
+
+@njit(cache=True)
+def bollinger(close, window=20, k=2.0):
+    """
+    ボリンジャーバンドの中心線・標準偏差・上下バンドを1パスで計算する。
+    移動窓の平均と偏差平方和を Welford 法で更新し、
+    標準偏差は pandas の rolling().std() と同じ標本標準偏差 (ddof=1)
+    """
+    n = close.shape[0]
+    mean_out = np.empty(n)
+    std_out = np.empty(n)
+    upper = np.empty(n)
+    lower = np.empty(n)
+
+    # 直近の連続した有効値の数と、その末尾 window 個の平均・偏差平方和
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        x = close[i]
+        if np.isnan(x):
+            # 窓内に NaN を含む間は NaN を返すので、集計をやり直す
+            count = 0
+            mean = 0.0
+            m2 = 0.0
+        elif count < window:
+            count += 1
+            d = x - mean
+            mean += d / count
+            m2 += d * (x - mean)
+        else:
+            # 窓から外れる値を除き、新しい値を加える
+            old = close[i - window]
+            new_mean = mean + (x - old) / window
+            m2 += (x - old) * (x - new_mean + old - mean)
+            mean = new_mean
+
+        if count >= window:
+            std = np.sqrt(max(m2, 0.0) / (window - 1))
+            mean_out[i] = mean
+            std_out[i] = std
+            upper[i] = mean + k * std
+            lower[i] = mean - k * std
+        else:
+            mean_out[i] = std_out[i] = upper[i] = lower[i] = np.nan
+
+    return mean_out, std_out, upper, lower